@@ -3,7 +3,7 @@
 #
 """Install tox-lsr hooks to tox (tox 2 and 3 version)."""
 
-import traceback
+import sys
 from tempfile import NamedTemporaryFile
 from typing import TYPE_CHECKING, cast
 
@@ -30,7 +30,8 @@ from .utils import (
 if TYPE_CHECKING:
     from configparser import ConfigParser
     from io import StringIO
-    from typing import List, Mapping, MutableMapping, Tuple
+    from types import FrameType
+    from typing import Mapping, MutableMapping, Optional
 
     # pylint: disable=too-few-public-methods
     class CastAnyAway(object):
@@ -88,16 +89,17 @@ class _LSRPath(py.path.local):
     def __str__(self):
         # type: (_LSRPath) -> str
         if self.tmppath:
-            call_stack = cast(
-                "List[Tuple[str, object, str, object]]",
-                traceback.extract_stack(),
-            )
-            for filename, _, func, _ in call_stack:
+            # walk the frames directly - extract_stack would build a
+            # summary of the whole stack on every call
+            frame = cast("Optional[FrameType]", sys._getframe(1))
+            while frame is not None:
+                code = frame.f_code
                 if (
-                    filename.endswith("iniconfig.py")
-                    or filename.endswith("iniconfig/__init__.py")
-                ) and func == "__init__":
+                    code.co_filename.endswith("iniconfig.py")
+                    or code.co_filename.endswith("iniconfig/__init__.py")
+                ) and code.co_name == "__init__":
                     return self.tmppath
+                frame = frame.f_back
         # pylint: disable=super-with-arguments
         return super(_LSRPath, self).__str__()
 
@@ -118,22 +120,54 @@ def prop_is_set(envconf, propname):
     return propname in cfg or propname in tecfg
 
 
+def _merge_setenv(envconf, def_envconf):
+    # type: (TestenvConfig, TestenvConfig) -> None
+    """Add the env vars from def_envconf which are not set in envconf."""
+
+    for envvar in def_envconf.setenv.keys():
+        if envvar not in envconf.setenv:
+            envconf.setenv[envvar] = def_envconf.setenv[envvar]
+
+
+def _merge_deps(envconf, def_envconf):
+    # type: (TestenvConfig, TestenvConfig) -> None
+    """Merge the deps lists."""
+
+    envconf.deps = list(set(envconf.deps + def_envconf.deps))
+
+
+def _merge_passenv(envconf, def_envconf):
+    # type: (TestenvConfig, TestenvConfig) -> None
+    """Merge the passenv sets."""
+
+    envconf.passenv = envconf.passenv.union(def_envconf.passenv)
+
+
+def _merge_allowlist_externals(envconf, def_envconf):
+    # type: (TestenvConfig, TestenvConfig) -> None
+    """Merge the allowlist_externals lists."""
+
+    envconf.allowlist_externals = list(
+        set(envconf.allowlist_externals + def_envconf.allowlist_externals)
+    )
+
+
+# the properties which can be merged and the functions which merge them
+MERGE_PROP_HANDLERS = {
+    "setenv": _merge_setenv,
+    "deps": _merge_deps,
+    "passenv": _merge_passenv,
+    "allowlist_externals": _merge_allowlist_externals,
+}
+
+
 def merge_prop_values(propname, envconf, def_envconf):
     # type: (str, TestenvConfig, TestenvConfig) -> None
     """If propname is one of the values we can merge, do the merge."""
 
-    if propname == "setenv":  # merge env vars
-        for envvar in def_envconf.setenv.keys():
-            if envvar not in envconf.setenv:
-                envconf.setenv[envvar] = def_envconf.setenv[envvar]
-    elif propname == "deps":
-        envconf.deps = list(set(envconf.deps + def_envconf.deps))
-    elif propname == "passenv":
-        envconf.passenv = envconf.passenv.union(def_envconf.passenv)
-    elif propname == "allowlist_externals":
-        envconf.allowlist_externals = list(
-            set(envconf.allowlist_externals + def_envconf.allowlist_externals)
-        )
+    handler = MERGE_PROP_HANDLERS.get(propname)
+    if handler is not None:
+        handler(envconf, def_envconf)
 
 
 def set_prop_values_ini(propname, def_conf, conf):
@@ -2,21 +2,26 @@
 """Launch qemu tests."""
 
 import argparse
+import collections
 import errno
+import functools
 import glob
-import json
 import logging
 import os
+import pathlib
 import re
+import select
 import shlex
 import shutil
 import subprocess  # nosec
 import sys
 import tempfile
+import threading
 import time
 import traceback
 
 try:
+    import urllib.error
     import urllib.parse
     import urllib.request
 except ImportError:
@@ -25,6 +30,16 @@ from contextlib import contextmanager
 
 import yaml
 
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 try:
     import productmd.compose
 
@@ -39,6 +54,19 @@ try:
 except ImportError:
     # print("No soup for you!")
     HAS_BS4 = False
+try:
+    import lxml  # noqa: F401 # pylint: disable=unused-import
+
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
 
 try:
     ProcessLookupError
@@ -59,10 +87,24 @@ DEFAULT_QEMU_INVENTORY_URL = (
 INVENTORY_FAIL_MSG = "ERROR: Inventory is empty, tests did not run"
 DEFAULT_PROFILE_TASK_LIMIT = 30  # report up to 30 tasks in profile
 DEFAULT_POST_SNAP_SLEEP_TIME = 1  # seconds
+COPY_BUFSIZE = 1 << 18  # 256 KiB buffer for copying downloads
+# do not check for updates of images downloaded less than this many seconds ago
+DEFAULT_IMAGE_CACHE_TTL = 3600
+# Path.home() falls back to the password database if HOME is not set
+DEFAULT_CONFIG_FILE = str(
+    pathlib.Path.home() / ".config" / "linux-system-roles.json"
+)
+DEFAULT_CACHE_DIR = str(pathlib.Path.home() / ".cache" / "linux-system-roles")
 
 COLLECTION_NAMESPACE = "fedora"
 COLLECTION_NAME = "linux_system_roles"
 
+TRUE_VALUES = frozenset(("y", "yes", "t", "true", "on", "1"))
+FALSE_VALUES = frozenset(("n", "no", "f", "false", "off", "0"))
+
+# requests sessions are not thread safe - keep one per thread
+REQUESTS_LOCAL = threading.local()
+
 
 def strtobool(val):
     """
@@ -73,24 +115,53 @@ def strtobool(val):
     'val' is anything else.
     """
     val = val.lower()
-    if val in ("y", "yes", "t", "true", "on", "1"):
+    if val in TRUE_VALUES:
         return 1
-    elif val in ("n", "no", "f", "false", "off", "0"):
+    elif val in FALSE_VALUES:
         return 0
     else:
         raise ValueError("invalid truth value %r" % (val,))
 
 
+def get_env_bool(name, default):
+    """Return the boolean value of environment variable name, or default."""
+    val = os.environ.get(name)
+    if val is None:
+        return default
+    return bool(strtobool(val))
+
+
+# defaults of the boolean options - the environment is read once at import
+ENV_BOOL_DEFAULTS = {
+    "debug": get_env_bool("LSR_QEMU_DEBUG", False),
+    "collection": get_env_bool("LSR_QEMU_COLLECTION", False),
+    "pretty": get_env_bool("LSR_QEMU_PRETTY", True),
+    "profile": get_env_bool("LSR_QEMU_PROFILE", True),
+    "remove_cloud_init": get_env_bool("LSR_QEMU_REMOVE_CLOUD_INIT", False),
+    "use_yum_cache": get_env_bool("LSR_QEMU_USE_YUM_CACHE", False),
+    "use_snapshot": get_env_bool("LSR_QEMU_USE_SNAPSHOT", False),
+    "wait_on_qemu": get_env_bool("LSR_QEMU_WAIT_ON_QEMU", False),
+    "erase_old_snapshot": get_env_bool("LSR_QEMU_ERASE_OLD_SNAPSHOT", False),
+    "ssh_el6": get_env_bool("LSR_QEMU_SSH_EL6", False),
+    "make_batch": get_env_bool("LSR_QEMU_MAKE_BATCH", False),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_ansible_config_list():
+    """Return the output of ansible-config list - run it only once."""
+    # keep the output as bytes - no need to decode it for a substring search
+    return subprocess.check_output(  # nosec
+        ["ansible-config", "list"], stderr=subprocess.STDOUT
+    )
+
+
+@functools.lru_cache(maxsize=None)
 def is_ansible_env_var_supported(env_var_name):
     """See if ansible supports the given config env var."""
-    result = subprocess.check_output(  # nosec
-        ["ansible-config", "list"], stderr=subprocess.STDOUT, encoding="utf-8"
-    )
     # look for name: ENV_VAR_NAME in output
-    match = re.search(r"name: {}\n".format(env_var_name), result)
-    if match:
-        return True
-    return False
+    name = "name: {}\n".format(env_var_name).encode()
+    return name in get_ansible_config_list()
 
 
 if is_ansible_env_var_supported("ANSIBLE_COLLECTIONS_PATH"):
@@ -100,7 +171,7 @@ else:
 
 
 def get_metadata_from_file(path, attr_key):
-    """Get metadata from key attr_key in file at given path."""
+    """Get metadata from key attr_key in file at given path or fd."""
     try:
         mdbytes = os.getxattr(path, attr_key)
     except OSError as e:
@@ -110,28 +181,128 @@ def get_metadata_from_file(path, attr_key):
     return os.fsdecode(mdbytes)
 
 
-def image_source_last_modified_by_file_metadata(path):
-    """Get last update metadata from file at given path."""
-    return (
-        get_metadata_from_file(path, DATE_XATTR)
-        if os.path.exists(path)
-        else ""
-    )
+def get_cached_image_metadata(path):
+    """
+    Return the original URL, last update metadata and mtime of an image.
 
+    The file is opened once and the xattrs and mtime are read from the
+    open fd, rather than looking up the path for each of them.  Returns
+    a tuple of (None, None, None) if the file does not exist or was not
+    downloaded by fetch_image.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None, None, None
+    try:
+        url = get_metadata_from_file(fd, URL_XATTR)
+        if url is None:
+            # not downloaded by fetch_image, so there is no date either
+            return None, None, None
+        return (
+            url,
+            get_metadata_from_file(fd, DATE_XATTR),
+            os.fstat(fd).st_mtime,
+        )
+    finally:
+        os.close(fd)
 
-def origurl(path):
-    """Return the original URL that a given file was downloaded from."""
-    return get_metadata_from_file(path, URL_XATTR)
 
+def get_requests_session():
+    """
+    Return the requests session of the current thread.
 
-def get_metadata_from_url(url, metadata_key):
-    """Get metadata from given url."""
+    The session reuses connections to the same server for all http and
+    https downloads done by the thread.
+    """
+    session = getattr(REQUESTS_LOCAL, "session", None)
+    if session is None:
+        session = requests.Session()
+        for scheme in ("http://", "https://"):
+            session.mount(
+                scheme, HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            )
+        REQUESTS_LOCAL.session = session
+    return session
+
+
+def open_url(url, headers=None):
+    """
+    Open url for reading.
+
+    http and https URLs are opened with the requests session of the
+    thread, if requests is available, so that connections to the same
+    server are reused.  Other URLs use urllib.  Returns None if the server
+    responds with 304 Not Modified.  Use copy_url_response or
+    read_url_response to read the body of the returned response.
+    """
+    if HAS_REQUESTS and url.startswith(("http://", "https://")):
+        response = get_requests_session().get(  # nosec
+            url, headers=headers, stream=True
+        )
+        if response.status_code == 304:  # not modified
+            response.close()
+            return None
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        return response
     try:
-        with urllib.request.urlopen(url) as url_response:  # nosec
-            return url_response.getheader(metadata_key)
-    except Exception:
-        with urllib.urlopen(url) as url_response:  # nosec
-            return url_response.getheader(metadata_key)
+        return urllib.request.urlopen(  # nosec
+            urllib.request.Request(url, headers=headers or {})
+        )
+    except urllib.error.HTTPError as e:
+        if e.code == 304:  # not modified
+            e.close()
+            return None
+        raise
+
+
+def is_requests_response(response):
+    """Return True if response was opened with requests."""
+    return HAS_REQUESTS and isinstance(response, requests.Response)
+
+
+def copy_url_response(response, dst):
+    """Copy the body of a response from open_url to the file dst."""
+    if is_requests_response(response):
+        for chunk in response.iter_content(chunk_size=COPY_BUFSIZE):
+            dst.write(chunk)
+    else:
+        # read fixed size chunks regardless of urllib internal buffering
+        for chunk in iter(functools.partial(response.read, COPY_BUFSIZE), b""):
+            dst.write(chunk)
+
+
+def read_url_response(response):
+    """Return the body of a response from open_url."""
+    if is_requests_response(response):
+        return response.content
+    return response.read()
+
+
+def open_url_if_modified(url, last_modified):
+    """
+    Open url for reading unless it was not modified since last_modified.
+
+    Uses a single conditional GET rather than a separate request to look
+    up the Last-Modified header.  Returns a tuple of the open response, or
+    None if the source was not modified, and the Last-Modified value of
+    the source.
+    """
+    # identity - do not let the body be transparently compressed
+    headers = {"Accept-Encoding": "identity"}
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    response = open_url(url, headers)
+    if response is None:
+        return None, last_modified
+    src_last_modified = response.headers.get("Last-Modified")
+    # in case the server, or the file:// handler, ignores If-Modified-Since
+    if last_modified and src_last_modified == last_modified:
+        response.close()
+        return None, last_modified
+    return response, src_last_modified
 
 
 def get_inventory_script(inventory):
@@ -141,11 +312,9 @@ def get_inventory_script(inventory):
             os.environ["TOX_WORK_DIR"], "standard-inventory-qcow2"
         )
         try:
-            with urllib.request.urlopen(  # nosec
-                inventory  # nosec
-            ) as url_response:  # nosec
+            with open_url(inventory) as url_response:
                 with open(inventory_tempfile, "wb") as inf:
-                    shutil.copyfileobj(url_response, inf)
+                    copy_url_response(url_response, inf)
             os.chmod(inventory_tempfile, 0o777)  # nosec
             inventory = inventory_tempfile
         except Exception:  # pylint: disable=broad-except
@@ -154,7 +323,56 @@ def get_inventory_script(inventory):
     return inventory
 
 
-def fetch_image(url, cache, label):
+def open_image_tempfile(cache):
+    """
+    Open a temporary file in cache to download an image into.
+
+    Uses an unnamed O_TMPFILE file if the kernel and the filesystem support
+    it, so that an interrupted download does not leave a partial file in
+    the cache.  Otherwise, uses a named temporary file.  Returns a tuple of
+    the open file, a path that can be used to open the file again, and
+    whether the file is unnamed.
+    """
+    # the unnamed file can only be copied into and linked via /proc
+    if os.path.isdir("/proc/self/fd"):
+        try:
+            fd = os.open(cache, os.O_TMPFILE | os.O_WRONLY, 0o600)
+        except (AttributeError, OSError):
+            pass
+        else:
+            return os.fdopen(fd, "wb"), "/proc/self/fd/{}".format(fd), True
+    image_tempfile = tempfile.NamedTemporaryFile(dir=cache, delete=False)
+    return image_tempfile, image_tempfile.name, False
+
+
+def save_image_tempfile(tmppath, path, unnamed):
+    """
+    Replace the image at path with the downloaded temporary file.
+
+    Raises OSError if that fails, after removing the named temporary file.
+    """
+    if unnamed:
+        # give the file a name, then atomically replace the old image
+        cache, image_name = os.path.split(path)
+        linkname = "{}.{}.tmp".format(image_name, os.getpid())
+        # a dir_fd makes os.link use linkat(AT_SYMLINK_FOLLOW), which
+        # is needed to link the /proc/self/fd path to the file
+        dirfd = os.open(cache, os.O_RDONLY)
+        try:
+            if os.path.lexists(os.path.join(cache, linkname)):
+                os.unlink(linkname, dir_fd=dirfd)
+            os.link(tmppath, linkname, dst_dir_fd=dirfd, follow_symlinks=True)
+        finally:
+            os.close(dirfd)
+        tmppath = os.path.join(cache, linkname)
+    try:
+        os.rename(tmppath, path)
+    except OSError:
+        os.unlink(tmppath)
+        raise
+
+
+def fetch_image(url, cache, label, cache_ttl=DEFAULT_IMAGE_CACHE_TTL):
     """
     Fetch an image from url into the cache with label.
 
@@ -167,6 +385,9 @@ def fetch_image(url, cache, label):
     would lead to leftover image files filling up the cache directory,
     as nobody would delete them when the URL changes.
 
+    An image downloaded less than @cache_ttl seconds ago is used without
+    asking the server whether it was updated.
+
     Returns the full path to the image.
     """
 
@@ -174,41 +395,94 @@ def fetch_image(url, cache, label):
     nameroot, suffix = os.path.splitext(original_name)
     image_name = label + suffix
     path = os.path.join(cache, image_name)
-    image_last_modified_by_src = get_metadata_from_url(url, "Last-Modified")
-    image_last_modified_by_file = image_source_last_modified_by_file_metadata(
+    cached_url, image_last_modified_by_file, mtime = get_cached_image_metadata(
         path
     )
+    if cached_url != url:
+        image_last_modified_by_file = None
+    elif time.time() - mtime < cache_ttl:
+        # recently downloaded - do not even ask the server
+        logging.info("Using cached image %s for %s", path, image_name)
+        return path
+    try:
+        request, image_last_modified_by_src = open_url_if_modified(
+            url, image_last_modified_by_file
+        )
+    except Exception:  # pylint: disable=broad-except
+        logging.warning(traceback.format_exc())
+        return None
+    if request is None:
+        # the cached image is current - restart its cache ttl
+        os.utime(path)
+        logging.info("Using cached image %s for %s", path, image_name)
+        return path
 
-    if (
-        not os.path.exists(path)
-        or url != origurl(path)
-        or image_last_modified_by_src != image_last_modified_by_file
-    ):
-        logging.info("Fetch url %s for %s", url, image_name)
-
-        image_tempfile = tempfile.NamedTemporaryFile(dir=cache, delete=False)
+    logging.info("Fetch url %s for %s", url, image_name)
+    image_tempfile, tmppath, unnamed = open_image_tempfile(cache)
+    try:
+        with request:
+            parsed_url = urllib.parse.urlparse(url)
+            if parsed_url.scheme == "file":
+                # copyfile lets the kernel do the copy (copy_file_range or
+                # sendfile) without going through userspace
+                shutil.copyfile(
+                    urllib.request.url2pathname(parsed_url.path), tmppath
+                )
+            else:
+                copy_url_response(request, image_tempfile)
+                image_tempfile.flush()
+    except Exception:  # pylint: disable=broad-except
+        logging.warning(traceback.format_exc())
+        image_tempfile.close()
+        if not unnamed:
+            os.unlink(tmppath)
+        return None
+
+    with image_tempfile:
+        fd = image_tempfile.fileno()
+        os.setxattr(fd, URL_XATTR, os.fsencode(url))
+        if image_last_modified_by_src:
+            os.setxattr(
+                fd, DATE_XATTR, os.fsencode(image_last_modified_by_src)
+            )
         try:
-            request = urllib.request.urlopen(url)  # nosec
-            shutil.copyfileobj(request, image_tempfile)
-            request.close()
-        except Exception:  # pylint: disable=broad-except
+            save_image_tempfile(tmppath, path, unnamed)
+        except OSError:
             logging.warning(traceback.format_exc())
-            os.unlink(image_tempfile.name)
             return None
 
-        os.setxattr(image_tempfile.name, URL_XATTR, os.fsencode(url))
-        os.setxattr(
-            image_tempfile.name,
-            DATE_XATTR,
-            os.fsencode(image_last_modified_by_src),
-        )
-        os.rename(image_tempfile.name, path)
-    else:
-        logging.info("Using cached image %s for %s", path, image_name)
-
     return path
 
 
+@functools.lru_cache(maxsize=None)
+def get_compose(composepath):
+    """Return the compose at composepath - fetch its metadata only once."""
+    return productmd.compose.Compose(composepath)
+
+
+@functools.lru_cache(maxsize=None)
+def get_compose_qcow2_images(composepath, desiredarch):
+    """
+    Return the qcow2 images for desiredarch in the compose at composepath.
+
+    Returns a tuple of the list of images, and dicts of the images indexed
+    by variant and by (variant, subvariant) - (None, subvariant) is for
+    any variant.  The result is cached, so callers must not modify it.
+    """
+    compose = get_compose(composepath)
+    candidates = []
+    by_variant = collections.defaultdict(list)
+    by_subvariant = collections.defaultdict(list)
+    for variant, arches in compose.images.images.items():
+        for image in arches.get(desiredarch, ()):
+            if image.type == "qcow2":
+                candidates.append(image)
+                by_variant[variant].append(image)
+                by_subvariant[(variant, image.subvariant)].append(image)
+                by_subvariant[(None, image.subvariant)].append(image)
+    return candidates, by_variant, by_subvariant
+
+
 def composeurl2images(
     composeurl, desiredarch, desiredvariant=None, desiredsubvariant=None
 ):
@@ -219,39 +493,31 @@ def composeurl2images(
     else:
         composepath = composeurl + "/"
 
-    compose = productmd.compose.Compose(composepath)
-
-    candidates = set()
-
-    for variant, arches in compose.images.images.items():
-        for arch in arches:
-            if arch == desiredarch:
-                for image in arches[arch]:
-                    if image.type == "qcow2":
-                        candidates.add((image, variant, image.subvariant))
+    candidates, by_variant, by_subvariant = get_compose_qcow2_images(
+        composepath, desiredarch
+    )
 
     # variant and subvariant are used only as a hint
     # to disambiguate if multiple images were found
-    if len(candidates) > 1:
-        if desiredvariant:
-            variantmatch = {
-                imginfo
-                for imginfo in candidates
-                if imginfo[1] == desiredvariant
-            }
-            if len(variantmatch) > 0:
-                candidates = variantmatch
-    if len(candidates) > 1:
-        if desiredsubvariant:
-            subvariantmatch = {
-                imginfo
-                for imginfo in candidates
-                if imginfo[2] == desiredsubvariant
-            }
-            if len(subvariantmatch) > 0:
-                candidates = subvariantmatch
-
-    return [(composepath + qcow2[0].path) for qcow2 in candidates]
+    variant_key = None
+    if len(candidates) > 1 and desiredvariant in by_variant:
+        candidates = by_variant[desiredvariant]
+        variant_key = desiredvariant
+    if len(candidates) > 1 and desiredsubvariant:
+        candidates = (
+            by_subvariant.get((variant_key, desiredsubvariant)) or candidates
+        )
+
+    return [(composepath + qcow2.path) for qcow2 in candidates]
+
+
+@functools.lru_cache(maxsize=None)
+def centos_image_name_re(centosver, desiredarch):
+    """Return the compiled regex for CentOS Stream image names."""
+    pat = (
+        r"CentOS-Stream-GenericCloud-{}-\([1-9][0-9]+[.][0-9]+\)[.]{}[.]qcow2"
+    )
+    return re.compile(pat.format(centosver, desiredarch))
 
 
 def centoshtml2image(url, desiredarch):
@@ -269,17 +535,16 @@ def centoshtml2image(url, desiredarch):
         logging.error("Could not determine CentOS version from %s", url)
         return ""
 
-    page = urllib.request.urlopen(url)  # nosec
-    tree = BeautifulSoup(page.read(), "html.parser")
+    with open_url(url) as page:
+        page_content = read_url_response(page)
+    # lxml is much faster than the pure python html.parser
+    tree = BeautifulSoup(page_content, "lxml" if HAS_LXML else "html.parser")
     imagelist = [
         td.a["href"]
         for td in tree.find_all("td", class_="indexcolname")
         if td.a["href"].endswith(".qcow2")
     ]
-    pat = (
-        r"CentOS-Stream-GenericCloud-{}-\([1-9][0-9]+[.][0-9]+\)[.]{}[.]qcow2"
-    )
-    namematch = re.compile(pat.format(centosver, desiredarch))
+    namematch = centos_image_name_re(centosver, desiredarch)
 
     def getdatekey(imagename):
         match = namematch.match(imagename)
@@ -287,7 +552,9 @@ def centoshtml2image(url, desiredarch):
             return match.group(1)
         return ""
 
-    candidate = sorted(imagelist, key=getdatekey)[-1]
+    # max() returns the first of equal keys - reverse the list to get the
+    # last one
+    candidate = max(reversed(imagelist), key=getdatekey)
     return path + candidate
 
 
@@ -322,12 +589,9 @@ def get_url(image):
         )
 
 
-def get_image(images, image_name):
+def get_image(images_by_name, image_name):
     """Get the image config for the given image_name, or None."""
-    for image in images:
-        if image["name"] == image_name:
-            return image
-    return None
+    return images_by_name.get(image_name)
 
 
 def make_setup_yml(
@@ -472,14 +736,21 @@ def make_setup_yml(
         if setup_play["tasks"]:
             setup_plays.append(setup_play)
         with open(pre_setup_yml, "w") as syf:
-            yaml.safe_dump(setup_plays, syf)
+            yaml.dump(
+                setup_plays, syf, Dumper=SafeDumper, default_flow_style=False
+            )
     else:
         if os.path.exists(pre_setup_yml):
             os.unlink(pre_setup_yml)
         pre_setup_yml = None
     if post_setup_plays:
         with open(post_setup_yml, "w") as syf:
-            yaml.safe_dump(post_setup_plays, syf)
+            yaml.dump(
+                post_setup_plays,
+                syf,
+                Dumper=SafeDumper,
+                default_flow_style=False,
+            )
     else:
         if os.path.exists(post_setup_yml):
             os.unlink(post_setup_yml)
@@ -492,9 +763,11 @@ def get_image_config(args):
     images = {}
 
     if args.config != "NONE":
-        with open(args.config) as configfile:
-            config = json.load(configfile)
-            images = config["images"]
+        with open(args.config, "rb") as configfile:
+            config = json_loads(configfile.read())
+            # the first image with a given name wins, as it always has
+            for image in config["images"]:
+                images.setdefault(image["name"], image)
 
     if args.image_name:
         image = get_image(images, args.image_name)
@@ -547,7 +820,7 @@ rh-allow-sha1-signatures = yes
     return
 
 
-def download_image(image, cache):
+def download_image(image, cache, cache_ttl=DEFAULT_IMAGE_CACHE_TTL):
     """Download the image to the cache."""
     if "file" not in image:
         image_url = get_url(image)
@@ -556,7 +829,7 @@ def download_image(image, cache):
             errstr = formatstr.format(image["name"], image)
             logging.critical(errstr)
             raise Exception(errstr)
-        image_path = fetch_image(image_url, cache, image["name"])
+        image_path = fetch_image(image_url, cache, image["name"], cache_ttl)
         if not image_path:
             formatstr = "Could not download image {} from URL {}."
             errstr = formatstr.format(image["name"], image_url)
@@ -565,6 +838,28 @@ def download_image(image, cache):
         image["file"] = image_path
 
 
+def wait_for_pidfd(pid):
+    """
+    Wait for the process pid to exit without polling.
+
+    Blocks on a pidfd until the process exits.  Returns False if pidfds
+    are not supported by python or the kernel, and the caller has to poll.
+    """
+    try:
+        pidfd = os.pidfd_open(pid)
+    except AttributeError:  # python 3.8 and earlier
+        return False
+    except ProcessLookupError:  # already exited
+        return True
+    except OSError:  # kernel 5.2 and earlier
+        return False
+    try:
+        select.select([pidfd], [], [])
+    finally:
+        os.close(pidfd)
+    return True
+
+
 def stop_qemu(test_env):
     """Stop qemu using LOCK_ON_FILE and wait for it to exit."""
     lock_on_file = test_env.get("LOCK_ON_FILE")
@@ -581,7 +876,7 @@ def stop_qemu(test_env):
             waitpid,
             lock_on_file,
         )
-        if waitpid == -1:
+        if waitpid == -1 or wait_for_pidfd(waitpid):
             return
         while True:
             try:
@@ -739,17 +1034,12 @@ def refresh_snapshot(
 
 def split_args_and_playbooks(args_and_playbooks):
     """Split remaining cmd line args into ansible args and playbooks."""
-    args = []
-    playbooks = []
-    if "--" in args_and_playbooks:
-        ary = args
-    else:
-        ary = playbooks
-    for item in args_and_playbooks:
-        if item == "--":
-            ary = playbooks
-        else:
-            ary.append(item)
+    if "--" not in args_and_playbooks:
+        return [], list(args_and_playbooks)
+    sep = args_and_playbooks.index("--")
+    args = args_and_playbooks[:sep]
+    # any further -- separators are ignored
+    playbooks = [item for item in args_and_playbooks[sep:] if item != "--"]
     return args, playbooks
 
 
@@ -797,6 +1087,13 @@ def handle_vault(tests_dir, ansible_args, playbooks, test_env):
         logging.info("Using vault variables")
 
 
+def abspaths(paths):
+    """Return the absolute paths, looking up the current directory once."""
+    # same as os.path.abspath, which calls os.getcwd() for each path
+    cwd = os.getcwd()
+    return [os.path.normpath(os.path.join(cwd, pth)) for pth in paths]
+
+
 class Batch(object):
     """The data for each batch of playbooks."""
 
@@ -804,8 +1101,8 @@ class Batch(object):
         """Init the batch object."""
         self.args = args
         self.ansible_args = ansible_args
-        self.playbooks = [os.path.abspath(pb) for pb in playbooks]
-        self.setup_playbooks = [os.path.abspath(pb) for pb in setup_playbooks]
+        self.playbooks = abspaths(playbooks)
+        self.setup_playbooks = abspaths(setup_playbooks)
 
 
 def get_batches_from_playbooks_and_args(
@@ -1190,6 +1487,35 @@ def setup_callback_plugins(pretty, profile, profile_task_limit, test_env):
     test_env["ANSIBLE_CALLBACK_PLUGINS"] = callback_plugin_dir
 
 
+def start_in_background(func, *args):
+    """
+    Call func(*args) in a daemon thread.
+
+    Returns a function which waits for the call to finish, and then returns
+    its result or raises its exception.  The thread does not keep the
+    process alive, so an error or a Ctrl-C on the main thread is not
+    delayed until the call finishes.
+    """
+    outcome = {}
+
+    def call():
+        try:
+            outcome["result"] = func(*args)
+        except BaseException as exc:  # pylint: disable=broad-except
+            outcome["exception"] = exc
+
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+
+    def wait():
+        thread.join()
+        if "exception" in outcome:
+            raise outcome["exception"]
+        return outcome.get("result")
+
+    return wait
+
+
 def runqemu(
     image,
     cache,
@@ -1219,6 +1545,7 @@ def runqemu(
     tests_dir=None,
     collection=False,
     make_batch=None,
+    image_cache_ttl=DEFAULT_IMAGE_CACHE_TTL,
 ):
     """Download the image, set up, run playbooks."""
     if write_inventory:
@@ -1231,20 +1558,6 @@ def runqemu(
             errmsg = fmtstr.format(write_inventory)
             logging.critical(errmsg)
             raise Exception(errmsg)
-    download_image(image, cache)
-    pre_setup_yml, post_setup_yml = make_setup_yml(
-        image, cache, remove_cloud_init, use_snapshot, use_yum_cache
-    )
-    local_setup_yml = []
-    if pre_setup_yml:
-        local_setup_yml.append(pre_setup_yml)
-    if setup_yml:
-        local_setup_yml.extend(setup_yml)
-    if post_setup_yml:
-        local_setup_yml.append(post_setup_yml)
-    local_cleanup_yml = []
-    if cleanup_yml:
-        local_cleanup_yml.extend(cleanup_yml)
     if collection_path is None and "TOX_WORK_DIR" in os.environ:
         collection_path = os.environ["TOX_WORK_DIR"]
     test_env = dict(image.get("env", {}))
@@ -1255,9 +1568,26 @@ def runqemu(
         test_env["TEST_YUM_CACHE_PATHS"] = yum_cache_path
         yum_varlib_path = os.path.join(cache, image["name"] + "_yum_varlib")
         test_env["TEST_YUM_VARLIB_PATHS"] = yum_varlib_path
+    # downloading the image is the long network step - do it in the
+    # background while the rest of the setup runs
+    wait_for_download = start_in_background(
+        download_image, image, cache, image_cache_ttl
+    )
+    pre_setup_yml, post_setup_yml = make_setup_yml(
+        image, cache, remove_cloud_init, use_snapshot, use_yum_cache
+    )
     install_requirements(sourcedir, collection_path, test_env, collection)
     inventory = get_inventory_script(inventory)
     setup_callback_plugins(pretty, profile, profile_task_limit, test_env)
+    wait_for_download()
+    local_setup_yml = []
+    if pre_setup_yml:
+        local_setup_yml.append(pre_setup_yml)
+    if setup_yml:
+        local_setup_yml.extend(setup_yml)
+    if post_setup_yml:
+        local_setup_yml.append(post_setup_yml)
+    local_cleanup_yml = list(cleanup_yml or [])
     if ansible_args is None:
         ansible_args = []
     run_ansible_playbooks(
@@ -1296,26 +1626,30 @@ def help_epilog():
     playbooks."""
 
 
+@functools.lru_cache(maxsize=1)
 def get_arg_parser():
-    """Return the argparse parser for runqemu arguments."""
+    """Return the argparse parser for runqemu arguments - build it once."""
     parser = argparse.ArgumentParser(epilog=help_epilog())
     parser.add_argument(
         "--config",
-        default=os.environ.get(
-            "LSR_QEMU_CONFIG",
-            os.path.join(
-                os.environ["HOME"], ".config", "linux-system-roles.json"
-            ),
-        ),
+        default=os.environ.get("LSR_QEMU_CONFIG", DEFAULT_CONFIG_FILE),
         help="Directory with linux-system-roles qemu config file",
     )
     parser.add_argument(
         "--cache",
+        default=os.environ.get("LSR_QEMU_CACHE", DEFAULT_CACHE_DIR),
+        help="Directory for caching VM images",
+    )
+    parser.add_argument(
+        "--image-cache-ttl",
+        type=int,
         default=os.environ.get(
-            "LSR_QEMU_CACHE",
-            os.path.join(os.environ["HOME"], ".cache", "linux-system-roles"),
+            "LSR_QEMU_IMAGE_CACHE_TTL", DEFAULT_IMAGE_CACHE_TTL
+        ),
+        help=(
+            "Use cached images downloaded less than this many seconds ago "
+            "without checking for a newer version (default: %(default)s)."
         ),
-        help="Directory for caching VM images",
     )
     parser.add_argument(
         "--inventory",
@@ -1356,27 +1690,25 @@ def get_arg_parser():
     parser.add_argument(
         "--debug",
         action="store_true",
-        default=bool(strtobool(os.environ.get("LSR_QEMU_DEBUG", "False"))),
+        default=ENV_BOOL_DEFAULTS["debug"],
         help="Pass TEST_DEBUG=true to qemu for debugging the VM.",
     )
     parser.add_argument(
         "--collection",
         action="store_true",
-        default=bool(
-            strtobool(os.environ.get("LSR_QEMU_COLLECTION", "False"))
-        ),
+        default=ENV_BOOL_DEFAULTS["collection"],
         help="Run against a collection instead of a role.",
     )
     parser.add_argument(
         "--pretty",
         action="store_true",
-        default=bool(strtobool(os.environ.get("LSR_QEMU_PRETTY", "True"))),
+        default=ENV_BOOL_DEFAULTS["pretty"],
         help="Pretty print output (like stdout callback debug).",
     )
     parser.add_argument(
         "--profile",
         action="store_true",
-        default=bool(strtobool(os.environ.get("LSR_QEMU_PROFILE", "True"))),
+        default=ENV_BOOL_DEFAULTS["profile"],
         help="Show task profile (like profile_tasks).",
     )
     parser.add_argument(
@@ -1394,17 +1726,13 @@ def get_arg_parser():
     parser.add_argument(
         "--remove-cloud-init",
         action="store_true",
-        default=bool(
-            strtobool(os.environ.get("LSR_QEMU_REMOVE_CLOUD_INIT", "False"))
-        ),
+        default=ENV_BOOL_DEFAULTS["remove_cloud_init"],
         help="Remove cloud-init from the image before running tests.",
     )
     parser.add_argument(
         "--use-yum-cache",
         action="store_true",
-        default=bool(
-            strtobool(os.environ.get("LSR_QEMU_USE_YUM_CACHE", "False"))
-        ),
+        default=ENV_BOOL_DEFAULTS["use_yum_cache"],
         help=(
             "Create a dnf/yum RPM package cache - speed up for multiple runs."
         ),
@@ -1412,9 +1740,7 @@ def get_arg_parser():
     parser.add_argument(
         "--use-snapshot",
         action="store_true",
-        default=bool(
-            strtobool(os.environ.get("LSR_QEMU_USE_SNAPSHOT", "False"))
-        ),
+        default=ENV_BOOL_DEFAULTS["use_snapshot"],
         help="Use an image snapshot for multiple runs.",
     )
     parser.add_argument(
@@ -1437,9 +1763,7 @@ def get_arg_parser():
     parser.add_argument(
         "--wait-on-qemu",
         action="store_true",
-        default=bool(
-            strtobool(os.environ.get("LSR_QEMU_WAIT_ON_QEMU", "False"))
-        ),
+        default=ENV_BOOL_DEFAULTS["wait_on_qemu"],
         help="Wait for qemu to exit - not for interactive use.",
     )
     parser.add_argument(
@@ -1454,9 +1778,7 @@ def get_arg_parser():
     parser.add_argument(
         "--erase-old-snapshot",
         action="store_true",
-        default=bool(
-            strtobool(os.environ.get("LSR_QEMU_ERASE_OLD_SNAPSHOT", "False"))
-        ),
+        default=ENV_BOOL_DEFAULTS["erase_old_snapshot"],
         help=(
             "Erase any old, existing snapshot.  Use this with --use-snapshot "
             "to ensure snapshot is new."
@@ -1533,7 +1855,7 @@ def get_arg_parser():
     parser.add_argument(
         "--ssh-el6",
         action="store_true",
-        default=bool(strtobool(os.environ.get("LSR_QEMU_SSH_EL6", "False"))),
+        default=ENV_BOOL_DEFAULTS["ssh_el6"],
         help=(
             "Use additional SSH arguments and configuration to talk to "
             "an EL6 host."
@@ -1542,9 +1864,7 @@ def get_arg_parser():
     parser.add_argument(
         "--make-batch",
         action="store_true",
-        default=bool(
-            strtobool(os.environ.get("LSR_QEMU_MAKE_BATCH", "False"))
-        ),
+        default=ENV_BOOL_DEFAULTS["make_batch"],
         help=(
             "Create a batch file from all of the tests/tests_*.yml and run it."
         ),
@@ -1606,6 +1926,7 @@ def main():
         tests_dir=args.tests_dir,
         collection=args.collection,
         make_batch=args.make_batch,
+        image_cache_ttl=args.image_cache_ttl,
     )
 
 
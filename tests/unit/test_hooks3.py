@@ -3,21 +3,25 @@
 #
 """Tests for legacy (tox 2 & 3) tox_lsr hooks."""
 
+import io
 import os
 import shutil
 import tempfile
 
 try:
     from unittest import mock as unittest_mock
-    from unittest.mock import MagicMock, Mock, patch
+    from unittest.mock import DEFAULT, MagicMock, Mock, patch
 except ImportError:
     import mock as unittest_mock
-    from mock import MagicMock, Mock, patch
-
-from copy import deepcopy
+    from mock import DEFAULT, MagicMock, Mock, patch
 
 import pkg_resources
 
+try:
+    from importlib.resources import files as resource_files
+except ImportError:  # python < 3.9
+    resource_files = None
+
 # I have no idea why pylint complains about this.  This works:
 # command = python -c 'import py; print(dir(py.iniconfig))'
 # bug in pylint?  anyway, just ignore it
@@ -34,6 +38,7 @@ except ImportError:
 except AttributeError:
     from unittest import TestCase
 
+from tox_lsr import hooks3
 from tox_lsr.hooks3 import (
     _LSRPath,
     merge_config,
@@ -52,36 +57,124 @@ from tox_lsr.utils import (
     TOX_DEFAULT_INI,
 )
 
-from .utils import MockConfig
+from .utils import MockConfig, make_object
 
 # code uses some protected members such as _cfg, _parser, _reader
 # pylint: disable=protected-access
 
+# e.g. __file__ is tests/unit/something.py - TESTS_PATH is tests
+TESTS_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DEFAULT_TOX_INI_B = None
+_TOX_ATTRS = {"a": "a", "b": "b"}
+_DEF_TOX_ATTRS = {"a": "b", "b": "c", "c": "d", "_skip": "skip"}
+# read-only templates for the merge_prop_values tests - use _make_attrs
+# to get a mutable copy
+_PROPNAMES = ("setenv", "deps", "passenv", "allowlist_externals")
+_EMPTY_ATTRS = {
+    "setenv": {},
+    "deps": (),
+    "passenv": frozenset(),
+    "allowlist_externals": (),
+}
+_FULL_ATTRS = {
+    "setenv": {"a": "a", "b": "b"},
+    "deps": ("a", "b"),
+    "passenv": frozenset(["a", "b"]),
+    "allowlist_externals": ("a", "b"),
+}
+_MORE_ATTRS = {
+    "setenv": {"a": "a", "c": "c"},
+    "deps": ("a", "c"),
+    "passenv": frozenset(["a", "c"]),
+    "allowlist_externals": ("a", "c"),
+}
+_RESULT_ATTRS = {
+    "setenv": {"a": "a", "b": "b", "c": "c"},
+    "deps": ("a", "b", "c"),
+    "passenv": frozenset(["a", "b", "c"]),
+    "allowlist_externals": ("a", "b", "c"),
+}
+
+
+def get_default_tox_ini_b():
+    """Read the default tox ini only once for all of the tests."""
+    # pylint: disable=global-statement
+    global _DEFAULT_TOX_INI_B
+    if _DEFAULT_TOX_INI_B is None:
+        if resource_files is not None:
+            _DEFAULT_TOX_INI_B = (
+                resource_files("tox_lsr")
+                / CONFIG_FILES_SUBDIR
+                / TOX_DEFAULT_INI
+            ).read_bytes()
+        else:
+            _DEFAULT_TOX_INI_B = pkg_resources.resource_string(
+                "tox_lsr", CONFIG_FILES_SUBDIR + "/" + TOX_DEFAULT_INI
+            )
+    return _DEFAULT_TOX_INI_B
+
+
+def _lists_to_sets(attrs):
+    """Make merged list values comparable regardless of their order."""
+    return dict(
+        (key, set(val) if isinstance(val, (list, tuple)) else val)
+        for key, val in attrs.items()
+    )
+
+
+def _make_attrs(template):
+    """Return a mutable copy of one of the attribute templates."""
+    attrs = {}
+    for key, val in template.items():
+        if isinstance(val, frozenset):
+            attrs[key] = set(val)
+        elif isinstance(val, tuple):
+            attrs[key] = list(val)
+        else:
+            attrs[key] = dict(val)
+    return attrs
+
+
+def _make_cfgdict():
+    return {
+        "empty_str_prop": "",
+        "str_prop": "str_prop",
+        "int_prop": 0,
+        "bool_prop": False,
+        "float_prop": 0.0,
+        "list_prop": [1, 2, 3],
+        "empty_list_prop": [],
+        "dict_prop": {"a": "a"},
+        "empty_dict_prop": {},
+        "obj_prop": object(),
+        "none_prop": None,
+    }
+
 
 class HooksTestCase(TestCase):
-    def setUp(self):
-        self.toxworkdir = tempfile.mkdtemp()
-        patch(
+    # none of the tests write to toxworkdir, so share one for the class
+    @classmethod
+    def setUpClass(cls):
+        cls.toxworkdir = tempfile.mkdtemp()
+        cls.resource_filename_patcher = patch(
             "pkg_resources.resource_filename",
-            return_value=self.toxworkdir + "/" + SCRIPT_NAME,
-        ).start()
-        self.default_tox_ini_b = pkg_resources.resource_string(
-            "tox_lsr", CONFIG_FILES_SUBDIR + "/" + TOX_DEFAULT_INI
-        )
-        self.default_tox_ini_raw = self.default_tox_ini_b.decode()
-        # e.g. __file__ is tests/unit/something.py -
-        # fixture_path is tests/fixtures
-        self.tests_path = os.path.dirname(
-            os.path.dirname(os.path.abspath(__file__))
+            return_value=cls.toxworkdir + "/" + SCRIPT_NAME,
         )
+        cls.resource_filename_patcher.start()
+        cls.default_tox_ini_b = get_default_tox_ini_b()
+        cls.default_tox_ini_raw = cls.default_tox_ini_b.decode()
+        cls.tests_path = TESTS_PATH
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.resource_filename_patcher.stop()
+        shutil.rmtree(cls.toxworkdir)
+
+    def setUp(self):
         self.fixture_path = os.path.join(
             self.tests_path, "fixtures", self.id().split(".")[-1]
         )
 
-    def tearDown(self):
-        shutil.rmtree(self.toxworkdir)
-        patch.stopall()
-
     def test_tox_addoption(self):
         """Test tox_addoption."""
 
@@ -93,8 +186,8 @@ class HooksTestCase(TestCase):
         """Test tox_configure."""
 
         config = MockConfig(toxworkdir=self.toxworkdir)
-        with patch(
-            "tox_lsr.hooks3.is_lsr_enabled", return_value=False
+        with patch.object(
+            hooks3, "is_lsr_enabled", return_value=False
         ) as mock_ile:
             tox_configure(config)
             self.assertEqual(1, mock_ile.call_count)
@@ -105,26 +198,22 @@ class HooksTestCase(TestCase):
         with patch(
             "pkg_resources.resource_string",
             return_value=self.default_tox_ini_b,
-        ) as mock_rs:
-            with patch("tox_lsr.hooks3.merge_config") as mock_mc:
-                with patch(
-                    "tox_lsr.hooks3.merge_ini",
-                    return_value=self.default_tox_ini_raw,
-                ) as mock_mi:
-                    with patch(
-                        "tox_lsr.hooks3.Config",
-                        side_effect=[TypeError(), default_config],
-                    ) as mock_cfg:
-                        with patch(
-                            "tox_lsr.hooks3.ParseIni",
-                            side_effect=[TypeError(), None],
-                        ) as mock_pi:
-                            tox_configure(config)
-                            self.assertEqual(1, mock_rs.call_count)
-                            self.assertEqual(2, mock_pi.call_count)
-                            self.assertEqual(1, mock_mc.call_count)
-                            self.assertEqual(1, mock_mi.call_count)
-                            self.assertEqual(2, mock_cfg.call_count)
+        ) as mock_rs, patch.multiple(
+            hooks3,
+            merge_config=DEFAULT,
+            merge_ini=DEFAULT,
+            Config=DEFAULT,
+            ParseIni=DEFAULT,
+        ) as mocks:
+            mocks["merge_ini"].return_value = self.default_tox_ini_raw
+            mocks["Config"].side_effect = [TypeError(), default_config]
+            mocks["ParseIni"].side_effect = [TypeError(), None]
+            tox_configure(config)
+            self.assertEqual(1, mock_rs.call_count)
+            self.assertEqual(2, mocks["ParseIni"].call_count)
+            self.assertEqual(1, mocks["merge_config"].call_count)
+            self.assertEqual(1, mocks["merge_ini"].call_count)
+            self.assertEqual(2, mocks["Config"].call_count)
 
     def test_tox_merge_ini(self):
         """Test that given config is merged with default config ini."""
@@ -142,6 +231,13 @@ class HooksTestCase(TestCase):
             ) as out_f:
                 out_f.write(result)
         expected_file = os.path.join(self.fixture_path, "result.ini")
+        with io.open(expected_file, encoding="utf-8") as in_f:
+            expected_text = in_f.read()
+        # result.ini is written from the merge_ini output, so usually the
+        # text is identical and there is nothing to parse - the section
+        # order may differ on pythons without ordered dicts though
+        if result == expected_text:
+            return
         expected_ini = py.iniconfig.IniConfig(expected_file)
         result_ini = py.iniconfig.IniConfig("", result)
 
@@ -153,28 +249,16 @@ class HooksTestCase(TestCase):
         tec = Mock(envname="prop")
         tec._reader = Mock()
         tec._reader._cfg = Mock()
-        cfgdict = {
-            "empty_str_prop": "",
-            "str_prop": "str_prop",
-            "int_prop": 0,
-            "bool_prop": False,
-            "float_prop": 0.0,
-            "list_prop": [1, 2, 3],
-            "empty_list_prop": [],
-            "dict_prop": {"a": "a"},
-            "empty_dict_prop": {},
-            "obj_prop": object(),
-            "none_prop": None,
-        }
-        tec._reader._cfg.sections = deepcopy({"testenv": cfgdict})
+        cfgdict = _make_cfgdict()
+        tec._reader._cfg.sections = {"testenv": _make_cfgdict()}
         for prop in cfgdict:
             self.assertTrue(prop_is_set(tec, prop))
-        tec._reader._cfg.sections["testenv:prop"] = deepcopy(cfgdict)
+        tec._reader._cfg.sections["testenv:prop"] = _make_cfgdict()
         for prop in cfgdict:
             self.assertTrue(prop_is_set(tec, prop))
         del tec._reader._cfg.sections["testenv"]
         del tec._reader._cfg.sections["testenv:prop"]
-        tec.configure_mock(**deepcopy(cfgdict))
+        tec.configure_mock(**_make_cfgdict())
         for prop in cfgdict:
             self.assertFalse(prop_is_set(tec, prop))
 
@@ -188,72 +272,29 @@ class HooksTestCase(TestCase):
         self.assertFalse(tec.mock_calls)
         self.assertFalse(def_tec.mock_calls)
         # test empty tec
-        tec = MagicMock()
-        def_tec = MagicMock()
-        propnames = ["setenv", "deps", "passenv", "allowlist_externals"]
-        empty_attrs = {
-            "setenv": {},
-            "deps": [],
-            "passenv": set(),
-            "allowlist_externals": [],
-        }
-        tec.configure_mock(**deepcopy(empty_attrs))
-        full_attrs = {
-            "setenv": {"a": "a", "b": "b"},
-            "deps": ["a", "b"],
-            "passenv": set(["a", "b"]),
-            "allowlist_externals": ["a", "b"],
-        }
-        def_tec.configure_mock(**deepcopy(full_attrs))
-        for prop in propnames:
+        tec = make_object(**_make_attrs(_EMPTY_ATTRS))
+        def_tec = make_object(**_make_attrs(_FULL_ATTRS))
+        for prop in _PROPNAMES:
             merge_prop_values(prop, tec, def_tec)
-        for prop in propnames:
-            val = getattr(tec, prop)
-            exp_val = full_attrs[prop]
-            if isinstance(val, list):
-                self.assertEqual(set(exp_val), set(val))
-            else:
-                self.assertEqual(exp_val, val)
+        self.assertEqual(
+            _lists_to_sets(_FULL_ATTRS), _lists_to_sets(vars(tec))
+        )
         # test empty def_tec
-        tec = MagicMock()
-        def_tec = MagicMock()
-        tec.configure_mock(**deepcopy(full_attrs))
-        def_tec.configure_mock(**deepcopy(empty_attrs))
-        for prop in propnames:
+        tec = make_object(**_make_attrs(_FULL_ATTRS))
+        def_tec = make_object(**_make_attrs(_EMPTY_ATTRS))
+        for prop in _PROPNAMES:
             merge_prop_values(prop, tec, def_tec)
-        for prop in propnames:
-            val = getattr(tec, prop)
-            exp_val = full_attrs[prop]
-            if isinstance(val, list):
-                self.assertEqual(set(exp_val), set(val))
-            else:
-                self.assertEqual(exp_val, val)
+        self.assertEqual(
+            _lists_to_sets(_FULL_ATTRS), _lists_to_sets(vars(tec))
+        )
         # test merging
-        more_attrs = {
-            "setenv": {"a": "a", "c": "c"},
-            "deps": ["a", "c"],
-            "passenv": set(["a", "c"]),
-            "allowlist_externals": ["a", "c"],
-        }
-        result_attrs = {
-            "setenv": {"a": "a", "b": "b", "c": "c"},
-            "deps": ["a", "b", "c"],
-            "passenv": set(["a", "b", "c"]),
-            "allowlist_externals": ["a", "b", "c"],
-        }
-        tec = MagicMock()
-        def_tec = MagicMock()
-        tec.configure_mock(**deepcopy(full_attrs))
-        def_tec.configure_mock(**deepcopy(more_attrs))
-        for prop in propnames:
+        tec = make_object(**_make_attrs(_FULL_ATTRS))
+        def_tec = make_object(**_make_attrs(_MORE_ATTRS))
+        for prop in _PROPNAMES:
             merge_prop_values(prop, tec, def_tec)
-        for prop in propnames:
-            val = getattr(tec, prop)
-            exp_val = result_attrs[prop]
-            if isinstance(val, list):
-                self.assertEqual(set(exp_val), set(val))
-            else:
-                self.assertEqual(exp_val, val)
+        self.assertEqual(
+            _lists_to_sets(_RESULT_ATTRS), _lists_to_sets(vars(tec))
+        )
 
     def test_tox_merge_envconf(self):
         """Test the merge_envconf method."""
@@ -270,10 +311,10 @@ class HooksTestCase(TestCase):
 
         def_tec = Mock(unsettable="unsettable")
         tec = Mock()
-        with patch(
-            "tox_lsr.hooks3.prop_is_set", side_effect=mock_unsettable_is_set
+        with patch.object(
+            hooks3, "prop_is_set", side_effect=mock_unsettable_is_set
         ):
-            with patch("tox_lsr.hooks3.setattr", side_effect=AttributeError()):
+            with patch.object(hooks3, "setattr", side_effect=AttributeError()):
                 merge_envconf(tec, def_tec)
                 self.assertNotEqual(tec.unsettable, "unsettable")
 
@@ -292,7 +333,7 @@ class HooksTestCase(TestCase):
         )
         def_tec = Mock(spec=[prop], propa=prop, _ignoreme="ignoreme")
         tec = Mock(spec=[prop])
-        with patch("tox_lsr.hooks3.prop_is_set", side_effect=mock_prop_is_set):
+        with patch.object(hooks3, "prop_is_set", side_effect=mock_prop_is_set):
             merge_envconf(tec, def_tec)
         unittest_mock.FILTER_DIR = True  # reset to default
         self.assertEqual(prop, tec.propa)
@@ -306,10 +347,10 @@ class HooksTestCase(TestCase):
 
         def_tec = Mock(spec=[prop], propa=prop)
         tec = Mock(spec=[prop], propa="someothervalue")
-        with patch(
-            "tox_lsr.hooks3.prop_is_set", side_effect=mock_prop_is_set2
+        with patch.object(
+            hooks3, "prop_is_set", side_effect=mock_prop_is_set2
         ):
-            with patch("tox_lsr.hooks3.merge_prop_values") as mock_mpv:
+            with patch.object(hooks3, "merge_prop_values") as mock_mpv:
                 merge_envconf(tec, def_tec)
                 self.assertEqual(1, mock_mpv.call_count)
         self.assertEqual("someothervalue", tec.propa)
@@ -317,33 +358,28 @@ class HooksTestCase(TestCase):
     def test_tox_merge_config(self):
         """Test the merge_config method."""
 
-        tox_attrs = {
-            "a": "a",
-            "b": "b",
-        }
         tec = Mock()
         tec._cfg = Mock()
-        tec._cfg.sections = deepcopy({"tox": tox_attrs})
-        tec.configure_mock(**deepcopy(tox_attrs))
+        tec._cfg.sections = {"tox": dict(_TOX_ATTRS)}
+        tec.configure_mock(**_TOX_ATTRS)
         tec.envlist_explicit = False
         tec.envlist = ["a", "b"]
         tec.envlist_default = ["a", "b"]
         enva = {}
         envb = {}
         tec.envconfigs = {"a": enva, "b": envb}
-        def_tox_attrs = {"a": "b", "b": "c", "c": "d", "_skip": "skip"}
         unittest_mock.FILTER_DIR = (
             False  # for handling attributes that start with underscore
         )
         def_tec = Mock()
         def_tec._cfg = Mock()
-        def_tec._cfg.sections = deepcopy({"tox": def_tox_attrs})
-        def_tec.configure_mock(**deepcopy(def_tox_attrs))
+        def_tec._cfg.sections = {"tox": dict(_DEF_TOX_ATTRS)}
+        def_tec.configure_mock(**_DEF_TOX_ATTRS)
         def_tec.envlist = ["b", "c"]
         def_tec.envlist_default = ["b", "c"]
         envc = {}
         def_tec.envconfigs = {"b": {}, "c": envc}
-        with patch("tox_lsr.hooks3.merge_envconf") as mock_me:
+        with patch.object(hooks3, "merge_envconf") as mock_me:
             merge_config(tec, def_tec)
             self.assertEqual(1, mock_me.call_count)
         self.assertIs(enva, tec.envconfigs["a"])
@@ -397,11 +433,28 @@ class HooksTestCase(TestCase):
 
         real = "/no/such/path/to/realfile"
         temp = "/no/such/path/to/temp"
-        stack_plain = (("myfile", 1, "myfunc", "text"),)
-        stack_iniconfig = (("/path/to/iniconfig.py", 1, "__init__", "text"),)
-        with patch("traceback.extract_stack", return_value=stack_plain):
-            lsr = _LSRPath(real, temp)
+        frame_plain = make_object(
+            f_code=make_object(co_filename="myfile", co_name="myfunc"),
+            f_back=None,
+        )
+        frame_iniconfig = make_object(
+            f_code=make_object(
+                co_filename="/path/to/iniconfig.py", co_name="__init__"
+            ),
+            f_back=frame_plain,
+        )
+        frame_nested = make_object(
+            f_code=frame_plain.f_code, f_back=frame_iniconfig
+        )
+        lsr = _LSRPath(real, temp)
+        # patch only the sys module seen by hooks3, not the real one
+        with patch.object(
+            hooks3, "sys", make_object(_getframe=lambda depth: frame_plain)
+        ):
             self.assertEqual(real, str(lsr))
-        with patch("traceback.extract_stack", return_value=stack_iniconfig):
-            lsr = _LSRPath(real, temp)
+        with patch.object(
+            hooks3, "sys", make_object(_getframe=lambda depth: frame_nested)
+        ):
             self.assertEqual(temp, str(lsr))
+        # not called from IniConfig
+        self.assertEqual(real, str(lsr))
@@ -13,9 +13,9 @@ except AttributeError:
     from unittest import TestCase
 
 try:
-    from unittest.mock import Mock
+    from unittest.mock import Mock, patch
 except ImportError:
-    from mock import Mock
+    from mock import Mock, patch
 
 from tox_lsr.utils import (
     LSR_CONFIG_SECTION,
@@ -115,29 +115,26 @@ class UtilsTestCase(TestCase):
     def test_is_lsr_enabled(self):
         """Test is_lsr_enabled."""
 
-        config = MockConfig({})
-        config._cfg.get = Mock(return_value="false")
+        getter = Mock(return_value="false")
+        config = MockConfig(make_object(), cfg_get_func=getter)
         self.assertFalse(is_lsr_enabled(config))
         config._cfg.sections[LSR_CONFIG_SECTION] = {}
         self.assertFalse(is_lsr_enabled(config))
         self.assertFalse(is_lsr_enabled(config))
-        config._cfg.get = Mock(return_value="true")
+        getter.return_value = "true"
         self.assertTrue(is_lsr_enabled(config))
 
-        config._cfg.get = Mock(return_value="true")
-        os.environ[LSR_ENABLE_ENV] = "false"
-        self.assertFalse(is_lsr_enabled(config))
-        config._cfg.get = Mock(return_value="false")
-        os.environ[LSR_ENABLE_ENV] = "true"
-        self.assertTrue(is_lsr_enabled(config))
+        with patch.dict(os.environ, {LSR_ENABLE_ENV: "false"}):
+            self.assertFalse(is_lsr_enabled(config))
+        getter.return_value = "false"
+        with patch.dict(os.environ, {LSR_ENABLE_ENV: "true"}):
+            self.assertTrue(is_lsr_enabled(config))
 
-        config = MockConfig()
-        config._cfg.get = Mock(return_value="false")
-        os.environ[LSR_ENABLE_ENV] = "false"
+        config.reset(getter)
         setattr(config.option, LSR_ENABLE, True)
-        self.assertTrue(is_lsr_enabled(config))
-        config._cfg.get = Mock(return_value="true")
-        os.environ[LSR_ENABLE_ENV] = "true"
+        with patch.dict(os.environ, {LSR_ENABLE_ENV: "false"}):
+            self.assertTrue(is_lsr_enabled(config))
+        getter.return_value = "true"
         setattr(config.option, LSR_ENABLE, False)
-        self.assertFalse(is_lsr_enabled(config))
-        del os.environ[LSR_ENABLE_ENV]
+        with patch.dict(os.environ, {LSR_ENABLE_ENV: "true"}):
+            self.assertFalse(is_lsr_enabled(config))
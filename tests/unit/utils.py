@@ -197,13 +197,18 @@ class MockConfig(object):
             self.toxworkdir = kwargs["toxworkdir"]
             self.toxinipath = py.path.local(self.toxworkdir)
         self._cfg = Mock()
-        self._cfg.sections = {}
-        self._cfg.sections["tox"] = {}
-        self._cfg.get = kwargs.get("cfg_get_func", self.cfg_get_func)
+        self.reset(kwargs.get("cfg_get_func"))
         self.envlist_explicit = Mock()
         self.envconfigs = {}
         self._testenv_attr = Mock()
 
+    def reset(self, cfg_get_func=None):
+        """Reset the mocked ini data so that the config can be reused."""
+
+        self._cfg.sections = {}
+        self._cfg.sections["tox"] = {}
+        self._cfg.get = cfg_get_func or self.cfg_get_func
+
 
 class MockCoreConfigSet(object):
     """Mock tox 4 CoreConfigSet."""